@@ -5,121 +5,404 @@ Generate comprehensive statistics for the Part Inventory dataset,
 similar to those found in CVPR/ECCV/ICCV dataset papers.
 """
 
+import heapq
 import json
+import mmap
 import os
-from collections import defaultdict
+import platform
+import sys
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib parser
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # msgspec is optional; fall back to load_json
+    msgspec = None
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; fall back to the NumPy aggregator
+    njit = None
+
+
+# COCO image and category ids fit comfortably in int32; np.fromiter raises
+# OverflowError rather than silently wrapping if a file ever exceeds that
+ID_DTYPE = np.int32
+
 
 def load_json(filepath):
-    """Load a JSON annotation file."""
-    with open(filepath, 'r') as f:
+    """Load a JSON annotation file (uses orjson when it is installed)."""
+    with open(filepath, 'rb') as f:
+        if orjson is not None:
+            return orjson.loads(f.read())
         return json.load(f)
 
 
+if msgspec is not None:
+    class _Image(msgspec.Struct):
+        """Image entry; only the number of images is used, so no fields are decoded."""
+
+    class _Category(msgspec.Struct):
+        id: int
+        name: str
+        supercategory: str
+
+    class _Annotation(msgspec.Struct):
+        image_id: int
+        category_id: int
+        area: float = float('nan')
+
+    class _AnnotationFile(msgspec.Struct):
+        images: list[_Image]
+        annotations: list[_Annotation]
+        categories: list[_Category]
+
+
+def _load_split_msgspec(filepath):
+    """Decode only the needed fields of a memory-mapped annotation file with msgspec."""
+    with open(filepath, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        data = msgspec.json.decode(buf, type=_AnnotationFile)
+    anns = data.annotations
+    num_anns = len(anns)
+    return {
+        'num_images': len(data.images),
+        'categories': msgspec.to_builtins(data.categories),
+        'image_ids': np.fromiter((ann.image_id for ann in anns), dtype=ID_DTYPE, count=num_anns),
+        'category_ids': np.fromiter((ann.category_id for ann in anns), dtype=ID_DTYPE, count=num_anns),
+        'areas': np.fromiter((ann.area for ann in anns), dtype=np.float64, count=num_anns)
+    }
+
+
+def load_split(filepath):
+    """
+    Load only the fields of an annotation file that the statistics use.
+    
+    The images array contributes just its length, and annotations are
+    reduced to flat image id, category id and area arrays. The parsed
+    document is released as soon as this function returns. When msgspec
+    is installed the file is memory-mapped and decoded against a schema,
+    so unused fields (segmentations, image metadata) are never built.
+    """
+    if msgspec is not None:
+        return _load_split_msgspec(filepath)
+    
+    data = load_json(filepath)
+    anns = data['annotations']
+    num_anns = len(anns)
+    return {
+        'num_images': len(data['images']),
+        'categories': data['categories'],
+        'image_ids': np.fromiter((ann['image_id'] for ann in anns), dtype=ID_DTYPE, count=num_anns),
+        'category_ids': np.fromiter((ann['category_id'] for ann in anns), dtype=ID_DTYPE, count=num_anns),
+        'areas': np.fromiter((ann.get('area', np.nan) for ann in anns), dtype=np.float64, count=num_anns)
+    }
+
+
+def fast_median(values):
+    """Median via np.partition (linear-time selection instead of a full sort)."""
+    k = len(values) // 2
+    if len(values) % 2:
+        return float(np.partition(values, k)[k])
+    part = np.partition(values, [k - 1, k])
+    return (float(part[k - 1]) + float(part[k])) / 2
+
+
+def summarize(values):
+    """Mean, median, min, max and std of a 1-D sample (None when it is empty)."""
+    values = np.asarray(values)
+    if not values.size:
+        return None
+    return {
+        'mean': values.mean(),
+        'median': fast_median(values),
+        'min': values.min(),
+        'max': values.max(),
+        'std': values.std()
+    }
+
+
+def new_instance_counters():
+    """Flat per-name counters for annotation totals and single/multi instance pairs."""
+    return {
+        'total_annotations': Counter(),
+        'single_instance': Counter(),
+        'multi_instance': Counter()
+    }
+
+
+def _count_instances_loop(image_ids, category_ids, num_bins):
+    """
+    Count annotations and single/multi instance pairs per category.
+    
+    Expects annotations sorted by (image_id, category_id) so that every
+    (image, category) pair is one contiguous run. Returns per-category
+    totals, single and multi instance pair counts, and a histogram of
+    instances per pair.
+    """
+    num_anns = len(image_ids)
+    total_counts = np.zeros(num_bins, np.int64)
+    single_counts = np.zeros(num_bins, np.int64)
+    multi_counts = np.zeros(num_bins, np.int64)
+    instance_hist = np.zeros(num_anns + 1, np.int64)
+    
+    run_start = 0
+    for i in range(1, num_anns + 1):
+        if (i == num_anns or image_ids[i] != image_ids[run_start]
+                or category_ids[i] != category_ids[run_start]):
+            cat_id = category_ids[run_start]
+            count = i - run_start
+            total_counts[cat_id] += count
+            if count == 1:
+                single_counts[cat_id] += 1
+            else:
+                multi_counts[cat_id] += 1
+            instance_hist[count] += 1
+            run_start = i
+    
+    return total_counts, single_counts, multi_counts, instance_hist
+
+
+def _count_instances_python(image_ids, category_ids, num_bins):
+    """
+    Pure-Python equivalent of _count_instances_loop, used on PyPy.
+    
+    PyPy's tracing JIT specializes plain list and int operations well,
+    whereas per-element NumPy access goes through its slow C-API layer,
+    so the sorted ids are converted to lists before the scan.
+    """
+    image_ids = image_ids.tolist()
+    category_ids = category_ids.tolist()
+    num_anns = len(image_ids)
+    total_counts = [0] * num_bins
+    single_counts = [0] * num_bins
+    multi_counts = [0] * num_bins
+    instance_hist = [0] * (num_anns + 1)
+    
+    run_start = 0
+    for i in range(1, num_anns + 1):
+        if (i == num_anns or image_ids[i] != image_ids[run_start]
+                or category_ids[i] != category_ids[run_start]):
+            cat_id = category_ids[run_start]
+            count = i - run_start
+            total_counts[cat_id] += count
+            if count == 1:
+                single_counts[cat_id] += 1
+            else:
+                multi_counts[cat_id] += 1
+            instance_hist[count] += 1
+            run_start = i
+    
+    return (np.array(total_counts, dtype=np.int64), np.array(single_counts, dtype=np.int64),
+            np.array(multi_counts, dtype=np.int64), np.array(instance_hist, dtype=np.int64))
+
+
+def _run_starts(*keys):
+    """Start offsets of the runs of equal keys in arrays sorted by those keys."""
+    boundary = np.zeros(len(keys[0]), dtype=bool)
+    boundary[:1] = True
+    for key in keys:
+        boundary[1:] |= key[1:] != key[:-1]
+    return np.flatnonzero(boundary)
+
+
+def _run_lengths(starts, size):
+    """Lengths of the runs beginning at `starts` in an array of length `size`."""
+    return np.diff(starts, append=size)
+
+
+def _count_instances_numpy(image_ids, category_ids, num_bins):
+    """Vectorized equivalent of _count_instances_loop (same sorted input)."""
+    pair_starts = _run_starts(image_ids, category_ids)
+    pair_counts = _run_lengths(pair_starts, len(image_ids))
+    pair_categories = category_ids[pair_starts]
+    total_counts = np.bincount(category_ids, minlength=num_bins)
+    single_counts = np.bincount(pair_categories[pair_counts == 1], minlength=num_bins)
+    multi_counts = np.bincount(pair_categories[pair_counts > 1], minlength=num_bins)
+    instance_hist = np.bincount(pair_counts)
+    return total_counts, single_counts, multi_counts, instance_hist
+
+
+# PyPy: plain Python loop; CPython: Numba-compiled loop when numba is
+# installed, otherwise the vectorized NumPy version
+if platform.python_implementation() == 'PyPy':
+    count_instances = _count_instances_python
+elif njit is not None:
+    count_instances = njit(cache=True)(_count_instances_loop)
+else:
+    count_instances = _count_instances_numpy
+
+
+def split_name_from_path(filepath):
+    """Derive the split name (train/val/test) from an annotation filename."""
+    return os.path.basename(filepath).replace('spin2_', '').replace('_parts.json', '')
+
+
+def process_split(filepath):
+    """
+    Compute statistics for a single annotation file.
+    
+    Returns the split statistics together with the partial dataset-wide
+    tallies that analyze_dataset merges across splits, or None when the
+    file does not exist.
+    """
+    try:
+        split = load_split(filepath)
+    except FileNotFoundError:
+        return None
+    image_ids = split['image_ids']
+    category_ids = split['category_ids']
+    areas = split['areas']
+    num_anns = len(image_ids)
+    
+    # Initialize split stats
+    split_stats = {
+        'num_images': split['num_images'],
+        'num_annotations': num_anns,
+        'num_categories': len(split['categories']),
+        'instances_per_image': defaultdict(int),
+        'category_counts': Counter(),
+        'supercategory_counts': Counter()
+    }
+    partial = {
+        'categories': new_instance_counters(),
+        'supercategories': new_instance_counters(),
+        'instance_distribution': Counter()
+    }
+    
+    # Build category lookup tables indexed directly by category id
+    num_bins = max((cat['id'] for cat in split['categories']), default=0) + 1
+    category_lookup = np.empty(num_bins, dtype=object)
+    supercategory_lookup = np.empty(num_bins, dtype=object)
+    for cat in split['categories']:
+        category_lookup[cat['id']] = cat['name']
+        supercategory_lookup[cat['id']] = cat['supercategory']
+    
+    partial['area_statistics'] = areas[~np.isnan(areas)]
+    
+    # Sort once by (image_id, category_id) so every image and every
+    # (image, category) pair is a contiguous run of annotations
+    order = np.lexsort((category_ids, image_ids))
+    sorted_image_ids = image_ids[order]
+    sorted_category_ids = category_ids[order]
+    
+    # Count annotations per image
+    image_starts = _run_starts(sorted_image_ids)
+    anns_per_image = _run_lengths(image_starts, num_anns)
+    split_stats['annotations_per_image'] = anns_per_image
+    split_stats['avg_annotations_per_image'] = (
+        anns_per_image.mean() if anns_per_image.size else float('nan'))
+    
+    # Per-category annotation totals, single/multi instance pair counts,
+    # and the number of instances per (image, category) pair
+    total_counts, single_counts, multi_counts, instance_hist = count_instances(
+        sorted_image_ids, sorted_category_ids, num_bins)
+    
+    # Track instance distribution (how many instances per image per category)
+    instance_counts = np.flatnonzero(instance_hist)
+    for count in instance_counts.tolist():
+        partial['instance_distribution'][count] += int(instance_hist[count])
+        split_stats['instances_per_image'][count] += int(instance_hist[count])
+    
+    # Visit categories in the order they first appear when annotations are
+    # grouped by image, so ties in the sorted reports keep a stable order
+    first_seen = np.minimum.reduceat(order, image_starts)
+    image_index = np.empty(num_anns, dtype=np.int64)
+    image_index[order] = np.repeat(np.arange(len(image_starts)), anns_per_image)
+    visit_order = np.argsort(first_seen[image_index], kind='stable')
+    seen_cats, first_visit = np.unique(category_ids[visit_order], return_index=True)
+    
+    cat_order = seen_cats[np.argsort(first_visit)]
+    
+    for cat_name, supercat_name, total, single, multi in zip(
+            category_lookup[cat_order].tolist(),
+            supercategory_lookup[cat_order].tolist(),
+            total_counts[cat_order].tolist(),
+            single_counts[cat_order].tolist(),
+            multi_counts[cat_order].tolist()):
+        # Track category and supercategory counts
+        split_stats['category_counts'][cat_name] += total
+        split_stats['supercategory_counts'][supercat_name] += total
+        
+        partial['categories']['total_annotations'][cat_name] += total
+        partial['supercategories']['total_annotations'][supercat_name] += total
+        
+        # Track category-specific instance stats
+        partial['categories']['single_instance'][cat_name] += single
+        partial['supercategories']['single_instance'][supercat_name] += single
+        partial['categories']['multi_instance'][cat_name] += multi
+        partial['supercategories']['multi_instance'][supercat_name] += multi
+    
+    return split_stats, partial
+
+
 def analyze_dataset(annotation_files):
     """
     Analyze annotation files and compute comprehensive statistics.
     
+    Each file is parsed and aggregated in its own worker process; the
+    per-split results are merged here in the order the files were given.
+    
     Returns a dictionary with all computed statistics.
     """
     stats = {
         'splits': {},
         'overall': defaultdict(int),
-        'categories': defaultdict(lambda: defaultdict(int)),
-        'supercategories': defaultdict(lambda: defaultdict(int)),
-        'instance_distribution': defaultdict(int),
-        'annotations_per_image': [],
-        'instances_per_annotation': [],
+        'categories': new_instance_counters(),
+        'supercategories': new_instance_counters(),
+        'instance_distribution': Counter(),
         'area_statistics': []
     }
     
-    # Process each split
     for filepath in annotation_files:
-        if not os.path.exists(filepath):
+        print(f"\nProcessing {split_name_from_path(filepath)} split...")
+    
+    results = []
+    if annotation_files:
+        with ProcessPoolExecutor(max_workers=len(annotation_files)) as executor:
+            results = list(executor.map(process_split, annotation_files))
+    
+    # Merge the per-split results
+    for filepath, result in zip(annotation_files, results):
+        if result is None:
             print(f"Warning: {filepath} not found, skipping...")
             continue
-            
-        split_name = os.path.basename(filepath).replace('spin2_', '').replace('_parts.json', '')
-        print(f"\nProcessing {split_name} split...")
+        split_stats, partial = result
         
-        data = load_json(filepath)
+        stats['splits'][split_name_from_path(filepath)] = split_stats
         
-        # Initialize split stats
-        split_stats = {
-            'num_images': len(data['images']),
-            'num_annotations': len(data['annotations']),
-            'num_categories': len(data['categories']),
-            'annotations_per_image': [],
-            'instances_per_image': defaultdict(int),
-            'category_counts': defaultdict(int),
-            'supercategory_counts': defaultdict(int)
-        }
-        
-        # Build category lookup
-        category_lookup = {}
-        supercategory_lookup = {}
-        for cat in data['categories']:
-            category_lookup[cat['id']] = cat['name']
-            supercategory_lookup[cat['id']] = cat['supercategory']
-        
-        # Count annotations per image
-        image_annotations = defaultdict(list)
-        for ann in data['annotations']:
-            image_annotations[ann['image_id']].append(ann)
-        
-        # Analyze each image
-        for img_id, anns in image_annotations.items():
-            num_anns = len(anns)
-            split_stats['annotations_per_image'].append(num_anns)
-            stats['annotations_per_image'].append(num_anns)
-            
-            # Count instances per category in this image
-            category_instances = defaultdict(int)
-            for ann in anns:
-                cat_id = ann['category_id']
-                category_instances[cat_id] += 1
-                
-                # Track category and supercategory counts
-                split_stats['category_counts'][category_lookup[cat_id]] += 1
-                split_stats['supercategory_counts'][supercategory_lookup[cat_id]] += 1
-                
-                stats['categories'][category_lookup[cat_id]]['total_annotations'] += 1
-                stats['supercategories'][supercategory_lookup[cat_id]]['total_annotations'] += 1
-                
-                # Track annotation area if available
-                if 'area' in ann:
-                    stats['area_statistics'].append(ann['area'])
-            
-            # Track instance distribution (how many instances per image per category)
-            for cat_id, count in category_instances.items():
-                stats['instance_distribution'][count] += 1
-                split_stats['instances_per_image'][count] += 1
-                stats['instances_per_annotation'].append(count)
-                
-                # Track category-specific instance stats
-                cat_name = category_lookup[cat_id]
-                if count == 1:
-                    stats['categories'][cat_name]['single_instance'] += 1
-                    stats['supercategories'][supercategory_lookup[cat_id]]['single_instance'] += 1
-                else:
-                    stats['categories'][cat_name]['multi_instance'] += 1
-                    stats['supercategories'][supercategory_lookup[cat_id]]['multi_instance'] += 1
-        
-        # Store split statistics
-        stats['splits'][split_name] = split_stats
+        for key in ('categories', 'supercategories'):
+            for field, counter in partial[key].items():
+                stats[key][field].update(counter)
+        stats['instance_distribution'].update(partial['instance_distribution'])
+        stats['area_statistics'].append(partial['area_statistics'])
         
         # Update overall counts
         stats['overall']['total_images'] += split_stats['num_images']
         stats['overall']['total_annotations'] += split_stats['num_annotations']
     
     # Compute derived statistics
-    stats['overall']['num_categories'] = len(stats['categories'])
-    stats['overall']['num_supercategories'] = len(stats['supercategories'])
+    stats['area_statistics'] = np.concatenate(stats['area_statistics'] or [np.empty(0)])
+    stats['overall']['annotations_per_image'] = summarize(np.concatenate(
+        [split['annotations_per_image'] for split in stats['splits'].values()] or [np.empty(0)]))
+    stats['overall']['area'] = summarize(stats['area_statistics'])
+    stats['overall']['num_categories'] = len(stats['categories']['total_annotations'])
+    stats['overall']['num_supercategories'] = len(stats['supercategories']['total_annotations'])
     
     return stats
 
 
+def write_rows(rows):
+    """Write a block of table rows to stdout in a single call."""
+    if rows:
+        sys.stdout.write('\n'.join(rows) + '\n')
+
+
 def print_summary_statistics(stats):
     """Print a summary table similar to CVPR/ECCV/ICCV papers."""
     
@@ -143,49 +426,57 @@ def print_summary_statistics(stats):
     for split_name in ['train', 'val', 'test']:
         if split_name in stats['splits']:
             split_data = stats['splits'][split_name]
-            avg_ann = np.mean(split_data['annotations_per_image'])
+            avg_ann = split_data['avg_annotations_per_image']
             print(f"  {split_name.capitalize():<10} {split_data['num_images']:<12,} "
                   f"{split_data['num_annotations']:<15,} {avg_ann:<15.2f}")
     
     print(f"\n  Combined total annotation entries: {stats['overall']['total_annotations']:,}")
     
     # Annotations per image statistics
-    if stats['annotations_per_image']:
-        ann_per_img = np.array(stats['annotations_per_image'])
+    ann_per_img = stats['overall']['annotations_per_image']
+    if ann_per_img:
         print("\n📈 Annotations per Image:")
-        print(f"  Mean:   {ann_per_img.mean():.2f}")
-        print(f"  Median: {np.median(ann_per_img):.2f}")
-        print(f"  Min:    {ann_per_img.min()}")
-        print(f"  Max:    {ann_per_img.max()}")
-        print(f"  Std:    {ann_per_img.std():.2f}")
+        print(f"  Mean:   {ann_per_img['mean']:.2f}")
+        print(f"  Median: {ann_per_img['median']:.2f}")
+        print(f"  Min:    {ann_per_img['min']}")
+        print(f"  Max:    {ann_per_img['max']}")
+        print(f"  Std:    {ann_per_img['std']:.2f}")
     
     # Instance distribution
     print("\n🔢 Instance Distribution (Images with N instances of a category):")
-    total_image_category_pairs = sum(stats['instance_distribution'].values())
+    instance_distribution = stats['instance_distribution']
+    total_image_category_pairs = sum(instance_distribution.values())
     print(f"  Total image-category pairs: {total_image_category_pairs:,}")
     
     # Calculate actual total instances
-    total_instances = sum(k * v for k, v in stats['instance_distribution'].items())
-    single_instances = stats['instance_distribution'].get(1, 0) * 1  # 1 instance each
+    total_inst_per_k = {k: k * v for k, v in instance_distribution.items()}
+    total_instances = sum(total_inst_per_k.values())
+    single_instances = instance_distribution.get(1, 0) * 1  # 1 instance each
     multi_instances = total_instances - single_instances
     
     print(f"  Total instances: {total_instances:,}")
     print(f"\n  {'Instances':<12} {'Count':<12} {'Total Inst':<12} {'Percentage':<12}")
     print("  " + "-"*48)
     
-    for i in sorted(stats['instance_distribution'].keys())[:15]:  # Show first 15
-        count = stats['instance_distribution'][i]
-        total_inst = i * count
+    rows = []
+    shown_pairs = 0
+    shown_inst = 0
+    shown_keys = heapq.nsmallest(15, instance_distribution)  # Show first 15
+    for i in shown_keys:
+        count = instance_distribution[i]
+        total_inst = total_inst_per_k[i]
+        shown_pairs += count
+        shown_inst += total_inst
         pct = (count / total_image_category_pairs) * 100
-        print(f"  {i:<12} {count:<12,} {total_inst:<12,} {pct:<12.2f}%")
+        rows.append(f"  {i:<12} {count:<12,} {total_inst:<12,} {pct:<12.2f}%")
     
-    if len(stats['instance_distribution']) > 15:
-        remaining_pairs = sum(stats['instance_distribution'][k] for k in stats['instance_distribution'].keys() 
-                             if k > 15)
-        remaining_inst = sum(k * stats['instance_distribution'][k] for k in stats['instance_distribution'].keys() 
-                            if k > 15)
+    if len(instance_distribution) > 15:
+        remaining_pairs = total_image_category_pairs - shown_pairs
+        remaining_inst = total_instances - shown_inst
         pct = (remaining_pairs / total_image_category_pairs) * 100
-        print(f"  {'16+':<12} {remaining_pairs:<12,} {remaining_inst:<12,} {pct:<12.2f}%")
+        remaining_label = f"{shown_keys[-1] + 1}+"
+        rows.append(f"  {remaining_label:<12} {remaining_pairs:<12,} {remaining_inst:<12,} {pct:<12.2f}%")
+    write_rows(rows)
     
     print(f"\n  Summary:")
     print(f"    Image-category pairs with 1 instance:   {stats['instance_distribution'].get(1, 0):,} pairs")
@@ -197,68 +488,62 @@ def print_summary_statistics(stats):
     print(f"    Percentage of instances that are multi:  {multi_instances/total_instances*100:.2f}%")
     
     # Area statistics (if available)
-    if stats['area_statistics']:
-        areas = np.array(stats['area_statistics'])
+    areas = stats['overall']['area']
+    if areas:
         print("\n📐 Annotation Area Statistics (pixels²):")
-        print(f"  Mean:   {areas.mean():.2f}")
-        print(f"  Median: {np.median(areas):.2f}")
-        print(f"  Min:    {areas.min():.2f}")
-        print(f"  Max:    {areas.max():.2f}")
-        print(f"  Std:    {areas.std():.2f}")
+        print(f"  Mean:   {areas['mean']:.2f}")
+        print(f"  Median: {areas['median']:.2f}")
+        print(f"  Min:    {areas['min']:.2f}")
+        print(f"  Max:    {areas['max']:.2f}")
+        print(f"  Std:    {areas['std']:.2f}")
     
     print("\n" + "="*80)
 
 
-def print_category_statistics(stats):
-    """Print detailed category statistics."""
+def rank_by_total(counters):
+    """
+    Rows of (name, total, single, multi) from a set of instance counters,
+    sorted by total annotations in descending order.
+    """
+    single = counters['single_instance']
+    multi = counters['multi_instance']
+    return [(name, total, single[name], multi[name])
+            for name, total in counters['total_annotations'].most_common()]
+
+
+def _print_instance_table(title, label, ranked_rows):
+    """Print a total/single/multi table for pre-ranked rows."""
     
     print("\n" + "="*100)
-    print("CATEGORY STATISTICS")
+    print(title)
     print("="*100)
     
-    # Sort categories by total annotations
-    sorted_cats = sorted(stats['categories'].items(), 
-                        key=lambda x: x[1]['total_annotations'], 
-                        reverse=True)
-    
-    print(f"\n{'Category':<30} {'Total':<12} {'Single':<12} {'Multi':<12} {'% Single':<12}")
+    print(f"\n{label:<30} {'Total':<12} {'Single':<12} {'Multi':<12} {'% Single':<12}")
     print("-"*100)
     
-    for cat_name, cat_stats in sorted_cats:
-        total = cat_stats['total_annotations']
-        single = cat_stats.get('single_instance', 0)
-        multi = cat_stats.get('multi_instance', 0)
-        pct_single = (single / (single + multi) * 100) if (single + multi) > 0 else 0
+    rows = []
+    for name, total, single, multi in ranked_rows:
+        pairs = single + multi
+        pct_single = (single / pairs * 100) if pairs > 0 else 0
         
-        print(f"{cat_name:<30} {total:<12,} {single:<12,} {multi:<12,} {pct_single:<12.1f}%")
+        rows.append(f"{name:<30} {total:<12,} {single:<12,} {multi:<12,} {pct_single:<12.1f}%")
+    write_rows(rows)
     
     print("="*100)
 
 
-def print_supercategory_statistics(stats):
+def print_category_statistics(stats, ranked_cats=None):
+    """Print detailed category statistics."""
+    if ranked_cats is None:
+        ranked_cats = rank_by_total(stats['categories'])
+    _print_instance_table("CATEGORY STATISTICS", 'Category', ranked_cats)
+
+
+def print_supercategory_statistics(stats, ranked_supercats=None):
     """Print supercategory statistics."""
-    
-    print("\n" + "="*100)
-    print("SUPERCATEGORY STATISTICS")
-    print("="*100)
-    
-    # Sort supercategories by total annotations
-    sorted_supercats = sorted(stats['supercategories'].items(), 
-                             key=lambda x: x[1]['total_annotations'], 
-                             reverse=True)
-    
-    print(f"\n{'Supercategory':<30} {'Total':<12} {'Single':<12} {'Multi':<12} {'% Single':<12}")
-    print("-"*100)
-    
-    for supercat_name, supercat_stats in sorted_supercats:
-        total = supercat_stats['total_annotations']
-        single = supercat_stats.get('single_instance', 0)
-        multi = supercat_stats.get('multi_instance', 0)
-        pct_single = (single / (single + multi) * 100) if (single + multi) > 0 else 0
-        
-        print(f"{supercat_name:<30} {total:<12,} {single:<12,} {multi:<12,} {pct_single:<12.1f}%")
-    
-    print("="*100)
+    if ranked_supercats is None:
+        ranked_supercats = rank_by_total(stats['supercategories'])
+    _print_instance_table("SUPERCATEGORY STATISTICS", 'Supercategory', ranked_supercats)
 
 
 def print_split_comparison(stats):
@@ -288,46 +573,60 @@ def print_split_comparison(stats):
     for split in available_splits:
         all_instances.update(stats['splits'][split]['instances_per_image'].keys())
     
+    rows = []
     for i in sorted(list(all_instances))[:10]:  # Show first 10
-        print(f"{i:<12}", end='')
+        cells = [f"{i:<12}"]
         for split in available_splits:
             count = stats['splits'][split]['instances_per_image'].get(i, 0)
-            print(f"{count:<15,}", end='')
-        print()
+            cells.append(f"{count:<15,}")
+        rows.append(''.join(cells))
+    write_rows(rows)
     
     print("\n" + "="*80)
 
 
+LATEX_TABLE_TEMPLATE = r"""% Dataset Statistics Table
+\begin{{table}}[t]
+\centering
+\caption{{Dataset statistics for Part Inventory.}}
+\label{{tab:dataset_stats}}
+\begin{{tabular}}{{lccc}}
+\toprule
+Split & Images & Annotations & Avg. Ann/Img \\
+\midrule
+{split_rows}\midrule
+Total & {total_images:,} & {total_annotations:,} & {overall_avg:.2f} \\
+\bottomrule
+\end{{tabular}}
+\end{{table}}
+"""
+
+
 def export_statistics_to_latex(stats, output_file='dataset_statistics.tex'):
     """Export key statistics to a LaTeX table format."""
     
+    ann_per_img = stats['overall']['annotations_per_image']
+    overall_avg = ann_per_img['mean'] if ann_per_img else float('nan')
+    
+    split_rows = []
+    for split_name in ['train', 'val', 'test']:
+        if split_name in stats['splits']:
+            split_data = stats['splits'][split_name]
+            avg_ann = split_data['avg_annotations_per_image']
+            split_rows.append(f"{split_name.capitalize()} & "
+                              f"{split_data['num_images']:,} & "
+                              f"{split_data['num_annotations']:,} & "
+                              f"{avg_ann:.2f} \\\\\n")
+    
+    table = LATEX_TABLE_TEMPLATE.format(
+        split_rows=''.join(split_rows),
+        total_images=stats['overall']['total_images'],
+        total_annotations=stats['overall']['total_annotations'],
+        overall_avg=overall_avg
+    )
+    
     with open(output_file, 'w') as f:
-        f.write("% Dataset Statistics Table\n")
-        f.write("\\begin{table}[t]\n")
-        f.write("\\centering\n")
-        f.write("\\caption{Dataset statistics for Part Inventory.}\n")
-        f.write("\\label{tab:dataset_stats}\n")
-        f.write("\\begin{tabular}{lccc}\n")
-        f.write("\\toprule\n")
-        f.write("Split & Images & Annotations & Avg. Ann/Img \\\\\n")
-        f.write("\\midrule\n")
-        
-        for split_name in ['train', 'val', 'test']:
-            if split_name in stats['splits']:
-                split_data = stats['splits'][split_name]
-                avg_ann = np.mean(split_data['annotations_per_image'])
-                f.write(f"{split_name.capitalize()} & "
-                       f"{split_data['num_images']:,} & "
-                       f"{split_data['num_annotations']:,} & "
-                       f"{avg_ann:.2f} \\\\\n")
-        
-        f.write("\\midrule\n")
-        f.write(f"Total & {stats['overall']['total_images']:,} & "
-               f"{stats['overall']['total_annotations']:,} & "
-               f"{np.mean(stats['annotations_per_image']):.2f} \\\\\n")
-        f.write("\\bottomrule\n")
-        f.write("\\end{tabular}\n")
-        f.write("\\end{table}\n")
+        f.write(table)
     
     print(f"\n✅ LaTeX table exported to: {output_file}")
 
@@ -349,10 +648,14 @@ def main():
     # Analyze dataset
     stats = analyze_dataset(annotation_files)
     
+    # Rank categories and supercategories once for all reports
+    ranked_cats = rank_by_total(stats['categories'])
+    ranked_supercats = rank_by_total(stats['supercategories'])
+    
     # Print all statistics
     print_summary_statistics(stats)
-    print_supercategory_statistics(stats)
-    print_category_statistics(stats)
+    print_supercategory_statistics(stats, ranked_supercats)
+    print_category_statistics(stats, ranked_cats)
     print_split_comparison(stats)
     
     # Export to LaTeX
@@ -1,15 +1,41 @@
 import json
 import matplotlib.pyplot as plt
+from matplotlib import font_manager
 import numpy as np
+import pandas as pd
 from collections import defaultdict
-from matplotlib.patches import Patch
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
 import seaborn as sns
 import os
+import pickle
+from hashlib import blake2b
+from utils.file_cache import cache_file, load_cache, save_cache
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib parser
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # ijson is optional; without it each file is parsed whole
+    ijson = None
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; fall back to the NumPy run counter
+    njit = None
 
 # Set style for modern publication-quality figures
 plt.style.use('seaborn-v0_8-white')
 plt.rcParams['font.family'] = 'sans-serif'
-plt.rcParams['font.sans-serif'] = ['Inter', 'Open Sans', 'Arial', 'Helvetica', 'DejaVu Sans']
+# Resolve the preferred font once and pin it, so text rendering never walks the fallback list
+available_fonts = {font.name for font in font_manager.fontManager.ttflist}
+preferred_font = next((name for name in ['Inter', 'Open Sans', 'Arial', 'Helvetica']
+                       if name in available_fonts), 'DejaVu Sans')
+plt.rcParams['font.sans-serif'] = [preferred_font]
+font_manager.findfont(preferred_font)
 plt.rcParams['font.size'] = 15  # Increased from 12
 plt.rcParams['axes.labelsize'] = 19  # Increased from 15
 plt.rcParams['axes.titlesize'] = 23  # Increased from 18
@@ -31,85 +57,216 @@ def get_contrast_text_color(hex_color):
     luminance = 0.2126 * r + 0.7152 * g + 0.0722 * b
     return '#1a1a1a' if luminance > 0.6 else '#ffffff'
 
+# Segment colors per instance bucket, and the label color that reads on each
+INSTANCE_COLORS = {
+    '1': '#1f77b4',    # Blue
+    '2': '#ff7f0e',    # Orange
+    '3': '#2ca02c',    # Green
+    '4': '#d62728',    # Red
+    '5': '#9467bd',    # Purple
+    '6': '#8c564b',    # Brown
+    '7': '#e377c2',    # Pink
+    '8': '#7f7f7f',    # Gray
+    '9': '#bcbd22',    # Olive
+    '10+': '#17becf'   # Cyan
+}
+
+INSTANCE_TEXT_COLORS = {key: get_contrast_text_color(color) for key, color in INSTANCE_COLORS.items()}
+
 def load_annotation_data(json_path):
     """Load annotation data from JSON file."""
     print(f"Loading data from {json_path}...")
-    with open(json_path, 'r') as f:
+    with open(json_path, 'rb') as f:
+        if orjson is not None:
+            return orjson.loads(f.read())
         data = json.load(f)
     return data
 
-def count_instances_per_category(datasets):
+def apply_display_threshold(counts, min_display_height=15, transition_point=30):
+    """
+    Apply a minimum display height while preserving relative differences.
+    Values below transition_point are scaled to be at least min_display_height.
+    Works element-wise on a whole count array at once.
+    """
+    display = np.array(counts, dtype=np.float64)
+    boost = (display > 0) & (display < transition_point)
+    if not boost.any():
+        # Zeros stay zero and large values pass through unchanged
+        return display
+    # Logarithmic scaling for small values: ensures visibility and proportionality
+    # Maps [1, transition_point] to [min_display_height, transition_point]
+    scale_factor = (transition_point - min_display_height) / np.log(transition_point)
+    display[boost] = min_display_height + scale_factor * np.log(display[boost])
+    return display
+
+def _parse_one(json_path):
+    """
+    Parse one annotation file into compact id arrays so that only typed
+    buffers and the small category list travel back from worker processes.
+    Use instance_id if available, otherwise use instance_type.
+    """
+    if ijson is not None:
+        # Stream annotations one at a time so the whole document is never held in memory
+        print(f"Loading data from {json_path}...")
+        with open(json_path, 'rb') as f:
+            categories = list(ijson.items(f, 'categories.item', use_float=True))
+            f.seek(0)
+            ids = np.fromiter(chain.from_iterable(
+                (ann['image_id'], ann['category_id'], ann.get('instance_id', ann.get('instance_type', 0)))
+                for ann in ijson.items(f, 'annotations.item', use_float=True)), dtype=np.int64)
+        image_ids, category_ids, instance_ids = np.ascontiguousarray(ids.reshape(-1, 3).T)
+        return image_ids, category_ids, instance_ids, categories
+    
+    data = load_annotation_data(json_path)
+    annotations = data['annotations']
+    image_ids = np.fromiter((ann['image_id'] for ann in annotations), dtype=np.int64, count=len(annotations))
+    category_ids = np.fromiter((ann['category_id'] for ann in annotations), dtype=np.int64, count=len(annotations))
+    instance_ids = np.fromiter((ann.get('instance_id', ann.get('instance_type', 0)) for ann in annotations),
+                               dtype=np.int64, count=len(annotations))
+    categories = data['categories']
+    # Drop the parsed document before the arrays are pickled back to the parent
+    del data, annotations
+    return image_ids, category_ids, instance_ids, categories
+
+def build_arrays(paths):
+    """
+    Parse the annotation files in parallel, one worker per file, and return
+    (image_ids, category_ids, instance_ids, category_lookup) with one array
+    entry per annotation across all files. The parsed JSON dicts never leave
+    the worker processes, so the parent only ever holds the compact arrays.
+    """
+    with ProcessPoolExecutor(max_workers=len(paths)) as executor:
+        parsed = list(executor.map(_parse_one, paths))
+    
+    # Create category lookup from first dataset
+    category_lookup = {
+        cat['id']: {'name': cat['name'], 'supercategory': cat['supercategory']}
+        for cat in parsed[0][3]
+    }
+    
+    image_ids = np.concatenate([p[0] for p in parsed])
+    category_ids = np.concatenate([p[1] for p in parsed])
+    instance_ids = np.concatenate([p[2] for p in parsed])
+    return image_ids, category_ids, instance_ids, category_lookup
+
+def _bucket_histogram_loop(image_ids, category_ids, instance_ids, num_category_ids):
+    """
+    Count (image, category) pairs per category and instance bucket (1-9, 10+).
+    
+    Expects annotations sorted by (image_id, category_id, instance_id) so that
+    every pair is one contiguous run and repeated instance ids are adjacent.
+    """
+    histogram = np.zeros((num_category_ids, 10), np.int64)
+    num_anns = len(image_ids)
+    run_start = 0
+    num_instances = 0
+    for i in range(num_anns):
+        if i == run_start or instance_ids[i] != instance_ids[i - 1]:
+            num_instances += 1
+        if (i + 1 == num_anns or image_ids[i + 1] != image_ids[run_start]
+                or category_ids[i + 1] != category_ids[run_start]):
+            histogram[category_ids[run_start], min(num_instances, 10) - 1] += 1
+            run_start = i + 1
+            num_instances = 0
+    return histogram
+
+def _bucket_histogram_numpy(image_ids, category_ids, instance_ids, num_category_ids):
+    """Vectorized equivalent of _bucket_histogram_loop, used when numba is unavailable."""
+    new_pair = np.ones(len(image_ids), dtype=bool)
+    new_pair[1:] = (image_ids[1:] != image_ids[:-1]) | (category_ids[1:] != category_ids[:-1])
+    new_instance = new_pair.copy()
+    new_instance[1:] |= instance_ids[1:] != instance_ids[:-1]
+    num_instances = np.bincount(np.cumsum(new_pair) - 1, weights=new_instance).astype(np.int64)
+    bucket_idx = np.minimum(num_instances, 10) - 1
+    return np.bincount(category_ids[new_pair] * 10 + bucket_idx,
+                       minlength=num_category_ids * 10).reshape(num_category_ids, 10)
+
+# Numba-compiled loop when numba is installed (cached on disk across runs), NumPy otherwise
+bucket_histogram = njit(cache=True)(_bucket_histogram_loop) if njit is not None else _bucket_histogram_numpy
+
+def count_instances_per_category(image_ids, category_ids, instance_ids, category_lookup):
     """
     Count annotations grouped by part category and supercategory,
     split by instance count (1-10, 10+).
-    Processes multiple datasets (train, val, test).
+    Takes the parallel per-annotation id arrays from build_arrays, which
+    span all datasets (train, val, test).
     """
-    # Create category lookup from first dataset
-    category_lookup = {}
-    for cat in datasets[0]['categories']:
-        category_lookup[cat['id']] = {
-            'name': cat['name'],
-            'supercategory': cat['supercategory']
-        }
-    
-    # Count instances per image and category across all datasets
-    # Structure: {image_id: {category_id: set(instance_ids)}}
-    image_category_instances = defaultdict(lambda: defaultdict(set))
-    
-    for data in datasets:
-        for ann in data['annotations']:
-            image_id = ann['image_id']
-            category_id = ann['category_id']
-            # Use instance_id if available, otherwise use instance_type
-            instance_id = ann.get('instance_id', ann.get('instance_type', 0))
-            image_category_instances[image_id][category_id].add(instance_id)
-    
-    # Count annotations by category and instance count (1-10, 10+)
+    # Count unique instances per image and category: after a lexicographic sort each
+    # (image, category) pair is a contiguous run, and every change of instance_id
+    # inside a run marks one more distinct instance
+    order = np.lexsort((instance_ids, category_ids, image_ids))
+    num_category_ids = int(category_ids.max(initial=0)) + 1
+    histogram = bucket_histogram(image_ids[order], category_ids[order], instance_ids[order], num_category_ids)
+    
+    # Category ids are small dense ints, so names and supercategories are
+    # looked up by indexing id-aligned arrays rather than through the dict
+    lookup_ids = np.fromiter(category_lookup, dtype=np.int64, count=len(category_lookup))
+    table_size = max(num_category_ids, int(lookup_ids.max(initial=0)) + 1)
+    names = np.empty(table_size, dtype=object)
+    supercategories = np.empty(table_size, dtype=object)
+    names[lookup_ids] = [cat_info['name'] for cat_info in category_lookup.values()]
+    supercategories[lookup_ids] = [cat_info['supercategory'] for cat_info in category_lookup.values()]
+    
+    # Count annotations by category and instance count (1-10, 10+), grouped by supercategory
     instance_keys = ['1', '2', '3', '4', '5', '6', '7', '8', '9', '10+']
-    category_instance_counts = defaultdict(lambda: {k: 0 for k in instance_keys})
-    
-    for image_id, categories in image_category_instances.items():
-        for category_id, instance_set in categories.items():
-            num_instances = len(instance_set)  # Count unique instances
-            
-            if num_instances <= 9:
-                category_instance_counts[category_id][str(num_instances)] += 1
-            else:  # 10 or more
-                category_instance_counts[category_id]['10+'] += 1
-    
-    # Group by supercategory
-    supercategory_data = defaultdict(lambda: defaultdict(lambda: {k: 0 for k in instance_keys}))
-    
-    for category_id, counts in category_instance_counts.items():
-        cat_info = category_lookup[category_id]
-        supercategory = cat_info['supercategory']
-        category_name = cat_info['name']
-        supercategory_data[supercategory][category_name] = counts
+    present_ids = np.flatnonzero(histogram.sum(axis=1))
+    supercategory_data = defaultdict(dict)
+    
+    for supercategory, category_name, counts in zip(supercategories[present_ids], names[present_ids],
+                                                    histogram[present_ids].tolist()):
+        supercategory_data[supercategory][category_name] = dict(zip(instance_keys, counts))
+    
+    # Sort once here, so every consumer can iterate in display order
+    supercategory_data = {supercategory: dict(sorted(supercategory_data[supercategory].items()))
+                          for supercategory in sorted(supercategory_data)}
     
     return supercategory_data, category_lookup
 
-def create_histogram(supercategory_data, output_path='cvpr_figures/instance_histogram.png'):
+# Bump whenever the shape or ordering of the cached supercategory_data changes
+COUNTS_CACHE_VERSION = 2
+
+def render_digest(supercategory_data, png_dpi):
+    """Hash the plotted data together with this script, so style edits also invalidate old renders."""
+    # Plain dicts, so the digest does not depend on the mapping type callers pass in
+    plain_data = {supercategory: dict(categories) for supercategory, categories in supercategory_data.items()}
+    digest = blake2b(pickle.dumps(plain_data), digest_size=16)
+    with open(__file__, 'rb') as f:
+        digest.update(f.read())
+    digest.update(str(png_dpi).encode())
+    return digest.hexdigest()
+
+def digest_path(output_path):
+    """Sidecar file recording which render produced output_path."""
+    directory, name = os.path.split(output_path)
+    return os.path.join(directory, f".{name}.blake2b")
+
+def is_cached(output_path, digest):
+    """True if output_path exists and was rendered from the same data and script."""
+    if not os.path.exists(output_path):
+        return False
+    try:
+        with open(digest_path(output_path)) as f:
+            return f.read().strip() == digest
+    except FileNotFoundError:
+        return False
+
+def create_histogram(supercategory_data, output_paths=('cvpr_figures/instance_histogram.pdf',), png_dpi=150):
     """
     Create a grouped histogram showing annotations by part category,
     grouped by supercategory, with splits for 1-9 and 10+ instances.
+    
+    Each entry in output_paths is saved in the format given by its suffix;
+    vector PDF is the default, and PNG outputs are rasterized at png_dpi.
+    Outputs already rendered from identical data are left untouched.
     """
-    # Prepare data for plotting
-    supercategories = sorted(supercategory_data.keys())
+    digest = render_digest(supercategory_data, png_dpi)
+    if all(is_cached(path, digest) for path in output_paths):
+        print(f"Figure up to date: {', '.join(output_paths)}")
+        return None, None
     
     # Use a 10-color palette - combining tab10 for better distinction
     palette = sns.color_palette("tab10", 10)
-    colors = {
-        '1': '#1f77b4',    # Blue
-        '2': '#ff7f0e',    # Orange
-        '3': '#2ca02c',    # Green
-        '4': '#d62728',    # Red
-        '5': '#9467bd',    # Purple
-        '6': '#8c564b',    # Brown
-        '7': '#e377c2',    # Pink
-        '8': '#7f7f7f',    # Gray
-        '9': '#bcbd22',    # Olive
-        '10+': '#17becf'   # Cyan
-    }
+    colors = INSTANCE_COLORS
     
     # Calculate figure size based on number of categories
     total_categories = sum(len(cats) for cats in supercategory_data.values())
@@ -119,49 +276,21 @@ def create_histogram(supercategory_data, output_path='cvpr_figures/instance_hist
     fig, ax = plt.subplots(figsize=(fig_width, fig_height))
     fig.patch.set_facecolor('white')
     
-    # Prepare data
+    # Prepare data: one row per instance bucket, one column per category,
+    # filled straight into a preallocated count matrix
+    instance_keys = list(colors)
     all_categories = []
     all_supercategories = []
-    counts_1 = []
-    counts_2 = []
-    counts_3 = []
-    counts_4 = []
-    counts_5 = []
-    counts_6 = []
-    counts_7 = []
-    counts_8 = []
-    counts_9 = []
-    counts_10plus = []
-    
-    for supercategory in supercategories:
-        categories = sorted(supercategory_data[supercategory].keys())
-        for category in categories:
+    orig = np.zeros((len(instance_keys), total_categories), dtype=np.int64)
+    
+    # supercategory_data arrives sorted by supercategory, then category
+    for supercategory, categories in supercategory_data.items():
+        for category, category_counts in categories.items():
+            orig[:, len(all_categories)] = [category_counts[key] for key in instance_keys]
             all_categories.append(category)
             all_supercategories.append(supercategory)
-            counts = supercategory_data[supercategory][category]
-            counts_1.append(counts['1'])
-            counts_2.append(counts['2'])
-            counts_3.append(counts['3'])
-            counts_4.append(counts['4'])
-            counts_5.append(counts['5'])
-            counts_6.append(counts['6'])
-            counts_7.append(counts['7'])
-            counts_8.append(counts['8'])
-            counts_9.append(counts['9'])
-            counts_10plus.append(counts['10+'])
 
-    total_counts = {
-        '1': int(np.sum(counts_1)),
-        '2': int(np.sum(counts_2)),
-        '3': int(np.sum(counts_3)),
-        '4': int(np.sum(counts_4)),
-        '5': int(np.sum(counts_5)),
-        '6': int(np.sum(counts_6)),
-        '7': int(np.sum(counts_7)),
-        '8': int(np.sum(counts_8)),
-        '9': int(np.sum(counts_9)),
-        '10+': int(np.sum(counts_10plus))
-    }
+    total_counts = dict(zip(instance_keys, orig.sum(axis=1).tolist()))
     total_annotations = sum(total_counts.values())
     summary_lines = [
         'Image Annotations',
@@ -178,224 +307,49 @@ def create_histogram(supercategory_data, output_path='cvpr_figures/instance_hist
         f"Total: {total_annotations:,} image-part pairs"
     ]
     
-    # Apply minimum threshold for display so small values are visible but proportional
-    # Use a logarithmic-like scaling: small values get boosted to min_display_height
-    def apply_display_threshold(value, min_display_height=15, transition_point=30):
-        """
-        Apply a minimum display height while preserving relative differences.
-        Values below transition_point are scaled to be at least min_display_height.
-        """
-        if value == 0:
-            return 0
-        elif value < transition_point:
-            # Logarithmic scaling for small values: ensures visibility and proportionality
-            # Maps [1, transition_point] to [min_display_height, transition_point]
-            scale_factor = (transition_point - min_display_height) / np.log(transition_point)
-            return min_display_height + scale_factor * np.log(value)
-        else:
-            return value
-    
-    # Store original counts for labels
-    original_counts_1 = counts_1.copy()
-    original_counts_2 = counts_2.copy()
-    original_counts_3 = counts_3.copy()
-    original_counts_4 = counts_4.copy()
-    original_counts_5 = counts_5.copy()
-    original_counts_6 = counts_6.copy()
-    original_counts_7 = counts_7.copy()
-    original_counts_8 = counts_8.copy()
-    original_counts_9 = counts_9.copy()
-    original_counts_10plus = counts_10plus.copy()
-    
-    # Apply threshold to display values
-    counts_1_display = [apply_display_threshold(c) for c in counts_1]
-    counts_2_display = [apply_display_threshold(c) for c in counts_2]
-    counts_3_display = [apply_display_threshold(c) for c in counts_3]
-    counts_4_display = [apply_display_threshold(c) for c in counts_4]
-    counts_5_display = [apply_display_threshold(c) for c in counts_5]
-    counts_6_display = [apply_display_threshold(c) for c in counts_6]
-    counts_7_display = [apply_display_threshold(c) for c in counts_7]
-    counts_8_display = [apply_display_threshold(c) for c in counts_8]
-    counts_9_display = [apply_display_threshold(c) for c in counts_9]
-    counts_10plus_display = [apply_display_threshold(c) for c in counts_10plus]
+    # Apply threshold to display values; stack bottoms are the running sum of the layers below
+    disp = apply_display_threshold(orig)
+    bottoms = np.vstack([np.zeros((1, disp.shape[1])), np.cumsum(disp, axis=0)[:-1]])
     
     # Add alternating background bands per supercategory to increase salience
-    group_starts = []
-    group_ends = []
-    if len(all_supercategories) > 0:
-        current = all_supercategories[0]
-        start_idx = 0
-        for i, sc in enumerate(all_supercategories):
-            if sc != current:
-                group_starts.append(start_idx)
-                group_ends.append(i)
-                start_idx = i
-                current = sc
-        group_starts.append(start_idx)
-        group_ends.append(len(all_supercategories))
+    # Supercategories arrive already grouped, so each group is the run between label changes
+    supercategory_array = np.asarray(all_supercategories)
+    change_mask = np.ones(len(supercategory_array), dtype=bool)
+    change_mask[1:] = supercategory_array[1:] != supercategory_array[:-1]
+    group_starts = np.flatnonzero(change_mask)
+    group_ends = np.append(group_starts[1:], len(supercategory_array))
+    supercategory_labels = supercategory_array[group_starts].tolist()
 
-        for gi, (gs, ge) in enumerate(zip(group_starts, group_ends)):
-            left = gs - 0.5
-            right = ge - 0.5
-            ax.axvspan(left, right, facecolor='#f6f7fb' if gi % 2 == 0 else '#ffffff',
-                       alpha=0.8, zorder=0)
+    for gi, (gs, ge) in enumerate(zip(group_starts, group_ends)):
+        ax.axvspan(gs - 0.5, ge - 0.5, facecolor='#f6f7fb' if gi % 2 == 0 else '#ffffff',
+                   alpha=0.8, zorder=0)
 
     # Create stacked bar chart with modern styling
     x = np.arange(len(all_categories))
     width = 0.98  # Increased from 0.92 for larger bars
     
-    bars1 = ax.bar(x, counts_1_display, width, label='1 Instance', 
-                   color=colors['1'], edgecolor='none', linewidth=0, alpha=0.85)
-    
-    bottom_2 = np.array(counts_1_display)
-    bars2 = ax.bar(x, counts_2_display, width, bottom=bottom_2, label='2 Instances', 
-                   color=colors['2'], edgecolor='none', linewidth=0, alpha=0.85)
-    
-    bottom_3 = bottom_2 + np.array(counts_2_display)
-    bars3 = ax.bar(x, counts_3_display, width, bottom=bottom_3, label='3 Instances', 
-                   color=colors['3'], edgecolor='none', linewidth=0, alpha=0.85)
-    
-    bottom_4 = bottom_3 + np.array(counts_3_display)
-    bars4 = ax.bar(x, counts_4_display, width, bottom=bottom_4, label='4 Instances', 
-                   color=colors['4'], edgecolor='none', linewidth=0, alpha=0.85)
-    
-    bottom_5 = bottom_4 + np.array(counts_4_display)
-    bars5 = ax.bar(x, counts_5_display, width, bottom=bottom_5, label='5 Instances', 
-                   color=colors['5'], edgecolor='none', linewidth=0, alpha=0.85)
-    
-    bottom_6 = bottom_5 + np.array(counts_5_display)
-    bars6 = ax.bar(x, counts_6_display, width, bottom=bottom_6, label='6 Instances', 
-                   color=colors['6'], edgecolor='none', linewidth=0, alpha=0.85)
-    
-    bottom_7 = bottom_6 + np.array(counts_6_display)
-    bars7 = ax.bar(x, counts_7_display, width, bottom=bottom_7, label='7 Instances', 
-                   color=colors['7'], edgecolor='none', linewidth=0, alpha=0.85)
-    
-    bottom_8 = bottom_7 + np.array(counts_7_display)
-    bars8 = ax.bar(x, counts_8_display, width, bottom=bottom_8, label='8 Instances', 
-                   color=colors['8'], edgecolor='none', linewidth=0, alpha=0.85)
-    
-    bottom_9 = bottom_8 + np.array(counts_8_display)
-    bars9 = ax.bar(x, counts_9_display, width, bottom=bottom_9, label='9 Instances', 
-                   color=colors['9'], edgecolor='none', linewidth=0, alpha=0.85)
-    
-    bottom_10 = bottom_9 + np.array(counts_9_display)
-    bars10 = ax.bar(x, counts_10plus_display, width, bottom=bottom_10, label='10+ Instances', 
-                   color=colors['10+'], edgecolor='none', linewidth=0, alpha=0.85)
+    stacked_bars = []
+    for k, key in enumerate(instance_keys):
+        label = '1 Instance' if key == '1' else f'{key} Instances'
+        stacked_bars.append(ax.bar(x, disp[k], width, bottom=bottoms[k], label=label,
+                                   color=colors[key], edgecolor='none', linewidth=0, alpha=0.85))
 
     # Add value labels inside each stacked segment and totals on top
     # Use ORIGINAL counts for labels, but DISPLAY positions for placement
-    category_totals_display = bottom_10 + np.array(counts_10plus_display)
-    category_totals_original = [original_counts_1[i] + original_counts_2[i] + original_counts_3[i] + 
-                                original_counts_4[i] + original_counts_5[i] + original_counts_6[i] +
-                                original_counts_7[i] + original_counts_8[i] + original_counts_9[i] +
-                                original_counts_10plus[i]
-                                for i in range(len(original_counts_1))]
+    category_totals_display = bottoms[-1] + disp[-1]
+    category_totals_original = orig.sum(axis=0)
     max_total = category_totals_display.max() if len(category_totals_display) > 0 else 0
     label_offset = max_total * 0.02 if max_total else 1.0
     if max_total:
         ax.set_ylim(0, max_total * 1.22)
 
-    color_for_1 = get_contrast_text_color(colors['1'])
-    color_for_2 = get_contrast_text_color(colors['2'])
-    color_for_3 = get_contrast_text_color(colors['3'])
-    color_for_4 = get_contrast_text_color(colors['4'])
-    color_for_5 = get_contrast_text_color(colors['5'])
-    color_for_6 = get_contrast_text_color(colors['6'])
-    color_for_7 = get_contrast_text_color(colors['7'])
-    color_for_8 = get_contrast_text_color(colors['8'])
-    color_for_9 = get_contrast_text_color(colors['9'])
-    color_for_10 = get_contrast_text_color(colors['10+'])
-
-    for idx, rect in enumerate(bars1):
-        height = rect.get_height()
-        if height <= 0:
-            continue
-        y_pos = rect.get_y() + height / 2.0
-        ax.text(rect.get_x() + rect.get_width() / 2.0, y_pos,
-                f"{original_counts_1[idx]:,}", ha='center', va='center', fontsize=10,
-                color=color_for_1, fontweight='semibold')
-
-    for idx, rect in enumerate(bars2):
-        height = rect.get_height()
-        if height <= 0:
-            continue
-        y_pos = rect.get_y() + height / 2.0
-        ax.text(rect.get_x() + rect.get_width() / 2.0, y_pos,
-                f"{original_counts_2[idx]:,}", ha='center', va='center', fontsize=10,
-                color=color_for_2, fontweight='semibold')
-
-    for idx, rect in enumerate(bars3):
-        height = rect.get_height()
-        if height <= 0:
-            continue
-        y_pos = rect.get_y() + height / 2.0
-        ax.text(rect.get_x() + rect.get_width() / 2.0, y_pos,
-                f"{original_counts_3[idx]:,}", ha='center', va='center', fontsize=10,
-                color=color_for_3, fontweight='semibold')
-
-    for idx, rect in enumerate(bars4):
-        height = rect.get_height()
-        if height <= 0:
-            continue
-        y_pos = rect.get_y() + height / 2.0
-        ax.text(rect.get_x() + rect.get_width() / 2.0, y_pos,
-                f"{original_counts_4[idx]:,}", ha='center', va='center', fontsize=10,
-                color=color_for_4, fontweight='semibold')
-
-    for idx, rect in enumerate(bars5):
-        height = rect.get_height()
-        if height <= 0:
-            continue
-        y_pos = rect.get_y() + height / 2.0
-        ax.text(rect.get_x() + rect.get_width() / 2.0, y_pos,
-                f"{original_counts_5[idx]:,}", ha='center', va='center', fontsize=10,
-                color=color_for_5, fontweight='semibold')
-
-    for idx, rect in enumerate(bars6):
-        height = rect.get_height()
-        if height <= 0:
-            continue
-        y_pos = rect.get_y() + height / 2.0
-        ax.text(rect.get_x() + rect.get_width() / 2.0, y_pos,
-                f"{original_counts_6[idx]:,}", ha='center', va='center', fontsize=10,
-                color=color_for_6, fontweight='semibold')
-
-    for idx, rect in enumerate(bars7):
-        height = rect.get_height()
-        if height <= 0:
-            continue
-        y_pos = rect.get_y() + height / 2.0
-        ax.text(rect.get_x() + rect.get_width() / 2.0, y_pos,
-                f"{original_counts_7[idx]:,}", ha='center', va='center', fontsize=10,
-                color=color_for_7, fontweight='semibold')
-
-    for idx, rect in enumerate(bars8):
-        height = rect.get_height()
-        if height <= 0:
-            continue
-        y_pos = rect.get_y() + height / 2.0
-        ax.text(rect.get_x() + rect.get_width() / 2.0, y_pos,
-                f"{original_counts_8[idx]:,}", ha='center', va='center', fontsize=10,
-                color=color_for_8, fontweight='semibold')
-
-    for idx, rect in enumerate(bars9):
-        height = rect.get_height()
-        if height <= 0:
-            continue
-        y_pos = rect.get_y() + height / 2.0
-        ax.text(rect.get_x() + rect.get_width() / 2.0, y_pos,
-                f"{original_counts_9[idx]:,}", ha='center', va='center', fontsize=10,
-                color=color_for_9, fontweight='semibold')
-
-    for idx, rect in enumerate(bars10):
-        height = rect.get_height()
-        if height <= 0:
-            continue
-        y_pos = rect.get_y() + height / 2.0
-        ax.text(rect.get_x() + rect.get_width() / 2.0, y_pos,
-                f"{original_counts_10plus[idx]:,}", ha='center', va='center', fontsize=10,
-                color=color_for_10, fontweight='semibold')
+    # Label every non-empty segment with its original count, centered in the segment
+    # Positions come from the x/bottoms/disp arrays rather than per-rect getters
+    label_y = bottoms + disp / 2.0
+    for k, key in enumerate(instance_keys):
+        for idx in np.flatnonzero(orig[k]):
+            ax.text(x[idx], label_y[k, idx], f"{orig[k, idx]:,}", ha='center', va='center', fontsize=10,
+                    color=INSTANCE_TEXT_COLORS[key], fontweight='semibold')
 
     for idx, total_display in enumerate(category_totals_display):
         ax.text(x[idx], total_display + label_offset,
@@ -404,58 +358,30 @@ def create_histogram(supercategory_data, output_path='cvpr_figures/instance_hist
                 bbox=dict(boxstyle='round,pad=0.2', facecolor='white', edgecolor='#d0d0d0', alpha=0.95))
     
     # Add thin vertical lines to separate supercategories (on top of bands)
-    current_supercategory = all_supercategories[0]
-    supercategory_positions = [0]
-    supercategory_labels = [current_supercategory]
-    
-    for i, supercategory in enumerate(all_supercategories[1:], start=1):
-        if supercategory != current_supercategory:
-            ax.axvline(x=i - 0.5, color='#d0d4e4', linestyle='-', linewidth=1.0, alpha=0.8)
-            supercategory_positions.append(i)
-            supercategory_labels.append(supercategory)
-            current_supercategory = supercategory
+    for gs in group_starts[1:]:
+        ax.axvline(x=gs - 0.5, color='#d0d4e4', linestyle='-', linewidth=1.0, alpha=0.8)
     
     # Labels and formatting with modern style
     ax.set_xlabel('Part Category', fontweight='bold', fontsize=18, color='#333333')
     ax.set_ylabel('Number of Semantic Masks', fontweight='bold', fontsize=22, color='#333333')
     ax.set_title('Distribution of Part Instances per Semantic Mask', 
-                 fontweight='bold', pad=20, fontsize=26, color='#1a1a1a')
+                 fontweight='bold', pad=40, fontsize=26, color='#1a1a1a')
     
     # X-axis: show category names rotated
     ax.set_xticks(x)
     ax.set_xticklabels(all_categories, rotation=45, ha='right', color='#555555', fontsize=14)
     
-    # Add supercategory labels on a secondary x-axis
-    ax2 = ax.twiny()
-    ax2.set_xlim(ax.get_xlim())
-    
-    # Calculate midpoints for supercategory labels
-    supercategory_midpoints = []
-    for i in range(len(supercategory_positions)):
-        start = supercategory_positions[i]
-        end = supercategory_positions[i + 1] if i + 1 < len(supercategory_positions) else len(all_categories)
-        midpoint = (start + end - 1) / 2
-        supercategory_midpoints.append(midpoint)
-    
-    ax2.set_xticks(supercategory_midpoints)
-    ax2.set_xticklabels(supercategory_labels, fontweight='bold', fontsize=18, color='#1f2a44')
-    ax2.tick_params(axis='x', which='major', pad=10)
-    ax2.spines['top'].set_visible(False)
+    # Add supercategory labels above the plot, centered over each group
+    # (x in data coordinates, y in axes coordinates, so no secondary axes is needed)
+    supercategory_midpoints = (group_starts + group_ends - 1) / 2
+    for midpoint, label in zip(supercategory_midpoints, supercategory_labels):
+        ax.text(midpoint, 1.015, label, transform=ax.get_xaxis_transform(), ha='center', va='bottom',
+                fontweight='bold', fontsize=18, color='#1f2a44', clip_on=False)
     
     # Legend anchored to upper left (where annotation details were)
-    legend_handles = [
-        Patch(facecolor=colors['1'], edgecolor='none', linewidth=0, label='1 instance'),
-        Patch(facecolor=colors['2'], edgecolor='none', linewidth=0, label='2 instances'),
-        Patch(facecolor=colors['3'], edgecolor='none', linewidth=0, label='3 instances'),
-        Patch(facecolor=colors['4'], edgecolor='none', linewidth=0, label='4 instances'),
-        Patch(facecolor=colors['5'], edgecolor='none', linewidth=0, label='5 instances'),
-        Patch(facecolor=colors['6'], edgecolor='none', linewidth=0, label='6 instances'),
-        Patch(facecolor=colors['7'], edgecolor='none', linewidth=0, label='7 instances'),
-        Patch(facecolor=colors['8'], edgecolor='none', linewidth=0, label='8 instances'),
-        Patch(facecolor=colors['9'], edgecolor='none', linewidth=0, label='9 instances'),
-        Patch(facecolor=colors['10+'], edgecolor='none', linewidth=0, label='10+ instances')
-    ]
-    legend = ax.legend(handles=legend_handles, loc='upper left', bbox_to_anchor=(0.012, 0.98),
+    # The bar containers themselves serve as handles, so no extra Patch artists are created
+    legend_labels = ['1 instance' if key == '1' else f'{key} instances' for key in instance_keys]
+    legend = ax.legend(stacked_bars, legend_labels, loc='upper left', bbox_to_anchor=(0.012, 0.98),
                        frameon=True, framealpha=0.96, edgecolor='#d5d5d5', fancybox=True,
                        ncol=2, columnspacing=0.8, handlelength=1.4, title='Instances per image',
                        borderaxespad=0.4)
@@ -471,14 +397,29 @@ def create_histogram(supercategory_data, output_path='cvpr_figures/instance_hist
     ax.tick_params(colors='#555555')
     
     # Tight layout using full width (legend is inside top-right)
-    plt.tight_layout(rect=[0, 0, 1, 0.96])
-    
-    # Save figure with high resolution for printing
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    plt.savefig(output_path, dpi=450, bbox_inches='tight', facecolor='white', edgecolor='none')
-    print(f"Figure saved to {output_path}")
-    
-    plt.close(fig)
+    fig.tight_layout()
+    
+    # Compute the tight bounding box once and reuse it for every format, instead of
+    # letting each savefig run its own extra draw pass to find it
+    tight_bbox = fig.get_tightbbox(fig.canvas.get_renderer()).padded(plt.rcParams['savefig.pad_inches'])
+    
+    # Save each requested format; PDF stays vector and skips the Agg rasterizer entirely.
+    # The pyplot figure is released even if a save fails, so batch callers do not leak figures
+    try:
+        for output_path in output_paths:
+            os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+            fmt = os.path.splitext(output_path)[1].lstrip('.').lower()
+            if fmt == 'pdf':
+                fig.savefig(output_path, format='pdf', bbox_inches=tight_bbox, facecolor='white',
+                            edgecolor='none', metadata={'Creator': 'generate_cvpr_figures.py'})
+            else:
+                fig.savefig(output_path, format=fmt, dpi=png_dpi, bbox_inches=tight_bbox, facecolor='white',
+                            edgecolor='none')
+            with open(digest_path(output_path), 'w') as f:
+                f.write(digest)
+            print(f"Figure saved to {output_path}")
+    finally:
+        plt.close(fig)
     
     return fig, ax
 
@@ -488,58 +429,23 @@ def print_statistics(supercategory_data):
     print("ANNOTATION STATISTICS BY SUPERCATEGORY AND INSTANCE COUNT")
     print("="*150)
     
-    total_1 = 0
-    total_2 = 0
-    total_3 = 0
-    total_4 = 0
-    total_5 = 0
-    total_6 = 0
-    total_7 = 0
-    total_8 = 0
-    total_9 = 0
-    total_10plus = 0
-    
-    for supercategory in sorted(supercategory_data.keys()):
-        print(f"\n{supercategory}:")
-        print("-" * 150)
-        print(f"{'Part Category':<25} {'1':<8} {'2':<8} {'3':<8} {'4':<8} {'5':<8} {'6':<8} {'7':<8} {'8':<8} {'9':<8} {'10+':<8} {'Total':<10}")
-        print("-" * 150)
-        
-        supercategory_total = {'1': 0, '2': 0, '3': 0, '4': 0, '5': 0, '6': 0, '7': 0, '8': 0, '9': 0, '10+': 0}
-        
-        for category in sorted(supercategory_data[supercategory].keys()):
-            counts = supercategory_data[supercategory][category]
-            total = counts['1'] + counts['2'] + counts['3'] + counts['4'] + counts['5'] + counts['6'] + counts['7'] + counts['8'] + counts['9'] + counts['10+']
-            print(f"{category:<25} {counts['1']:<8} {counts['2']:<8} {counts['3']:<8} {counts['4']:<8} {counts['5']:<8} {counts['6']:<8} {counts['7']:<8} {counts['8']:<8} {counts['9']:<8} {counts['10+']:<8} {total:<10}")
-            
-            supercategory_total['1'] += counts['1']
-            supercategory_total['2'] += counts['2']
-            supercategory_total['3'] += counts['3']
-            supercategory_total['4'] += counts['4']
-            supercategory_total['5'] += counts['5']
-            supercategory_total['6'] += counts['6']
-            supercategory_total['7'] += counts['7']
-            supercategory_total['8'] += counts['8']
-            supercategory_total['9'] += counts['9']
-            supercategory_total['10+'] += counts['10+']
-        
-        supercategory_sum = sum(supercategory_total.values())
-        print("-" * 150)
-        print(f"{'Subtotal':<25} {supercategory_total['1']:<8} {supercategory_total['2']:<8} {supercategory_total['3']:<8} {supercategory_total['4']:<8} {supercategory_total['5']:<8} {supercategory_total['6']:<8} {supercategory_total['7']:<8} {supercategory_total['8']:<8} {supercategory_total['9']:<8} {supercategory_total['10+']:<8} {supercategory_sum:<10}")
-        
-        total_1 += supercategory_total['1']
-        total_2 += supercategory_total['2']
-        total_3 += supercategory_total['3']
-        total_4 += supercategory_total['4']
-        total_5 += supercategory_total['5']
-        total_6 += supercategory_total['6']
-        total_7 += supercategory_total['7']
-        total_8 += supercategory_total['8']
-        total_9 += supercategory_total['9']
-        total_10plus += supercategory_total['10+']
-    
-    print("\n" + "="*150)
-    print(f"{'GRAND TOTAL':<25} {total_1:<8} {total_2:<8} {total_3:<8} {total_4:<8} {total_5:<8} {total_6:<8} {total_7:<8} {total_8:<8} {total_9:<8} {total_10plus:<8} {total_1 + total_2 + total_3 + total_4 + total_5 + total_6 + total_7 + total_8 + total_9 + total_10plus:<10}")
+    # One row per (supercategory, part category), one column per instance count
+    instance_keys = list(INSTANCE_COLORS)
+    df = pd.DataFrame.from_dict(
+        {(supercategory, category): counts
+         for supercategory, categories in supercategory_data.items()
+         for category, counts in categories.items()},
+        orient='index', columns=instance_keys).sort_index()
+    df.index.names = ['Supercategory', 'Part Category']
+    df['Total'] = df.sum(axis=1)
+    
+    # Subtotal rows sort after each supercategory's parts; grand total goes last
+    subtotals = df.groupby(level=0).sum()
+    subtotals.index = pd.MultiIndex.from_product([subtotals.index, ['Subtotal']], names=df.index.names)
+    table = pd.concat([df, subtotals]).sort_index(level=0, sort_remaining=False, kind='stable')
+    table.loc[('GRAND TOTAL', ''), :] = df.sum()
+    
+    print(table.astype(np.int64).to_string(formatters={c: '{:,}'.format for c in table.columns}))
     print("="*150)
 
 def main():
@@ -550,22 +456,31 @@ def main():
         'data/annotations/spin2_test_parts.json'
     ]
     
-    # Load all datasets
-    datasets = []
+    # Parse all datasets in parallel, one worker per file
+    existing_files = []
     for annotation_file in annotation_files:
         if not os.path.exists(annotation_file):
             print(f"Warning: File not found: {annotation_file}")
             continue
-        datasets.append(load_annotation_data(annotation_file))
+        existing_files.append(annotation_file)
     
-    if not datasets:
+    if not existing_files:
         print("Error: No annotation files found!")
         return
     
-    print(f"\nLoaded {len(datasets)} dataset(s)")
+    # Reuse the counts from an earlier run when none of the files changed
+    cache_path = cache_file((os.path.basename(__file__), COUNTS_CACHE_VERSION), existing_files)
+    supercategory_data = load_cache(cache_path)
+    
+    if supercategory_data is None:
+        image_ids, category_ids, instance_ids, category_lookup = build_arrays(existing_files)
+        
+        # Count instances across all datasets
+        supercategory_data, category_lookup = count_instances_per_category(
+            image_ids, category_ids, instance_ids, category_lookup)
+        save_cache(cache_path, supercategory_data)
     
-    # Count instances across all datasets
-    supercategory_data, category_lookup = count_instances_per_category(datasets)
+    print(f"\nLoaded {len(existing_files)} dataset(s)")
     
     # Print statistics
     print_statistics(supercategory_data)
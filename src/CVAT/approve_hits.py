@@ -7,10 +7,15 @@ Usage:
     python approve_hits.py reject mturk_hits/QuadrupedFoot_train_123.json
 """
 
+import functools
+import html
+import itertools
 import json
+import re
 import sys
-import boto3
 import xml.etree.ElementTree as ET
+import boto3
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
 ENVIRONMENTS = {
@@ -18,10 +23,19 @@ ENVIRONMENTS = {
     "sandbox": "https://mturk-requester-sandbox.us-east-1.amazonaws.com",
 }
 
+# One QuestionIdentifier/FreeText pair per answer; FreeText may be self-closing when empty
+ANSWER_RE = re.compile(
+    r'<QuestionIdentifier>([^<]*)</QuestionIdentifier>\s*<FreeText(?:\s*/>|>([^<]*)</FreeText>)')
 
-def parse_answer_xml(answer_xml):
+# Approve/reject calls are independent HTTPS round-trips, so they are issued concurrently
+MAX_WORKERS = 16
+
+
+def parse_answer_xml_tree(answer_xml):
     """
-    Parse MTurk answer XML and extract cvat_job_id and comments.
+    Parse MTurk answer XML with ElementTree.
+
+    Used for answers ANSWER_RE cannot read, e.g. FreeText wrapped in CDATA.
 
     Args:
         answer_xml: XML string from MTurk assignment answer
@@ -61,8 +75,43 @@ def parse_answer_xml(answer_xml):
         return {'cvat_job_id': None, 'comments': None}
 
 
+def parse_answer_xml(answer_xml):
+    """
+    Parse MTurk answer XML and extract cvat_job_id and comments.
+
+    The answers are a flat list of QuestionIdentifier/FreeText pairs, so a
+    precompiled regex pulls them out without building an element tree. When
+    it cannot account for every <Answer> (CDATA, comments, attributes, ...),
+    the answer is parsed with ElementTree instead.
+
+    Args:
+        answer_xml: XML string from MTurk assignment answer
+
+    Returns:
+        dict with 'cvat_job_id' and 'comments' keys
+    """
+    answer_xml = answer_xml or ''
+    matches = ANSWER_RE.findall(answer_xml)
+    if len(matches) != answer_xml.count('<Answer>'):
+        print("  Warning: Unexpected answer XML layout, falling back to the XML parser")
+        return parse_answer_xml_tree(answer_xml)
+
+    result = {
+        'cvat_job_id': None,
+        'comments': None
+    }
+
+    for key, value in matches:
+        if key in result:
+            # Empty FreeText stays None, matching an element with no text
+            result[key] = html.unescape(value) if value else None
+
+    return result
+
+
+@functools.lru_cache(maxsize=None)
 def get_mturk_client(environment):
-    """Create MTurk client."""
+    """Create MTurk client, once per environment; boto3 clients are slow to build and thread-safe to share."""
     return boto3.client(
         "mturk",
         aws_access_key_id=AWS_ACCESS_KEY,
@@ -72,6 +121,13 @@ def get_mturk_client(environment):
     )
 
 
+def list_all_assignments(mturk, hit_id):
+    """List every assignment for a HIT, following pagination past the 100-per-call cap."""
+    paginator = mturk.get_paginator('list_assignments_for_hit')
+    return list(itertools.chain.from_iterable(
+        page.get('Assignments', []) for page in paginator.paginate(HITId=hit_id)))
+
+
 def view(json_file):
     """View HIT details and assignments."""
     with open(json_file, 'r') as f:
@@ -107,16 +163,19 @@ def view(json_file):
         qualifications = hit.get('QualificationRequirements', [])
         if qualifications:
             print(f"\n  Qualification Requirements:")
+            qual_names = {}  # one get_qualification_type call per distinct type
             for qual in qualifications:
                 qual_type_id = qual.get('QualificationTypeId', 'Unknown')
                 comparator = qual.get('Comparator', 'N/A')
 
                 # Try to get qualification name
-                try:
-                    qual_info = mturk.get_qualification_type(QualificationTypeId=qual_type_id)
-                    qual_name = qual_info['QualificationType']['Name']
-                except:
-                    qual_name = qual_type_id
+                if qual_type_id not in qual_names:
+                    try:
+                        qual_info = mturk.get_qualification_type(QualificationTypeId=qual_type_id)
+                        qual_names[qual_type_id] = qual_info['QualificationType']['Name']
+                    except Exception:
+                        qual_names[qual_type_id] = qual_type_id
+                qual_name = qual_names[qual_type_id]
 
                 # Get values
                 int_values = qual.get('IntegerValues', [])
@@ -138,10 +197,8 @@ def view(json_file):
         print(f"\n⚠️  Could not fetch HIT details from MTurk: {e}")
 
     # Get assignments
-    mturk = get_mturk_client(hit_data['mturk_info']['environment'])
     try:
-        response = mturk.list_assignments_for_hit(HITId=hit_data['mturk_info']['hit_id'])
-        assignments = response.get('Assignments', [])
+        assignments = list_all_assignments(mturk, hit_data['mturk_info']['hit_id'])
 
         if not assignments:
             print("\nNo assignments submitted yet.")
@@ -172,6 +229,43 @@ def view(json_file):
         print(f"\nError getting assignments: {e}")
 
 
+def review_submitted(assignments, review_call, feedback, done_label, error_label):
+    """
+    Approve or reject every submitted assignment concurrently.
+
+    Args:
+        assignments: assignments returned by list_assignments_for_hit
+        review_call: mturk.approve_assignment or mturk.reject_assignment
+        feedback: RequesterFeedback sent with each call
+        done_label: word printed on success, e.g. 'Approved'
+        error_label: word printed on failure, e.g. 'approving'
+    """
+    submitted = []
+    for assignment in assignments:
+        if assignment['AssignmentStatus'] == 'Submitted':
+            submitted.append(assignment)
+        else:
+            print(f"- Skipped {assignment['AssignmentId']} (status: {assignment['AssignmentStatus']})")
+
+    if not submitted:
+        return
+
+    # boto3 clients are thread-safe, so all workers share the one client
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(submitted))) as executor:
+        futures = {
+            executor.submit(review_call, AssignmentId=assignment['AssignmentId'],
+                            RequesterFeedback=feedback): assignment['AssignmentId']
+            for assignment in submitted
+        }
+        for future in as_completed(futures):
+            assignment_id = futures[future]
+            try:
+                future.result()
+                print(f"✓ {done_label}: {assignment_id}")
+            except Exception as e:
+                print(f"✗ Error {error_label} {assignment_id}: {e}")
+
+
 def approve(json_file):
     """Approve all submitted assignments for this HIT."""
     with open(json_file, 'r') as f:
@@ -183,25 +277,14 @@ def approve(json_file):
     print(f"\nApproving assignments for HIT: {hit_id}")
 
     try:
-        response = mturk.list_assignments_for_hit(HITId=hit_id)
-        assignments = response.get('Assignments', [])
+        assignments = list_all_assignments(mturk, hit_id)
 
         if not assignments:
             print("No assignments to approve.")
             return
 
-        for assignment in assignments:
-            if assignment['AssignmentStatus'] == 'Submitted':
-                try:
-                    mturk.approve_assignment(
-                        AssignmentId=assignment['AssignmentId'],
-                        RequesterFeedback="Thank you for your work!"
-                    )
-                    print(f"✓ Approved: {assignment['AssignmentId']}")
-                except Exception as e:
-                    print(f"✗ Error approving {assignment['AssignmentId']}: {e}")
-            else:
-                print(f"- Skipped {assignment['AssignmentId']} (status: {assignment['AssignmentStatus']})")
+        review_submitted(assignments, mturk.approve_assignment, "Thank you for your work!",
+                         'Approved', 'approving')
 
     except Exception as e:
         print(f"Error: {e}")
@@ -218,25 +301,14 @@ def reject(json_file):
     print(f"\nRejecting assignments for HIT: {hit_id}")
 
     try:
-        response = mturk.list_assignments_for_hit(HITId=hit_id)
-        assignments = response.get('Assignments', [])
+        assignments = list_all_assignments(mturk, hit_id)
 
         if not assignments:
             print("No assignments to reject.")
             return
 
-        for assignment in assignments:
-            if assignment['AssignmentStatus'] == 'Submitted':
-                try:
-                    mturk.reject_assignment(
-                        AssignmentId=assignment['AssignmentId'],
-                        RequesterFeedback="Work did not meet requirements."
-                    )
-                    print(f"✓ Rejected: {assignment['AssignmentId']}")
-                except Exception as e:
-                    print(f"✗ Error rejecting {assignment['AssignmentId']}: {e}")
-            else:
-                print(f"- Skipped {assignment['AssignmentId']} (status: {assignment['AssignmentStatus']})")
+        review_submitted(assignments, mturk.reject_assignment, "Work did not meet requirements.",
+                         'Rejected', 'rejecting')
 
     except Exception as e:
         print(f"Error: {e}")
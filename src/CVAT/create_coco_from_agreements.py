@@ -1,18 +1,121 @@
 # create_coco_from_agreements.py - Generate COCO format files from agreement data for manual CVAT import
-import os, json, argparse, glob
+import os, json, argparse, pickle
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from hashlib import blake2b
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib json module
+    orjson = None
+
 load_dotenv()
 
 # S3 bucket configuration for image URLs
 S3_BUCKET_NAME = os.environ.get("S3_BUCKET_NAME", "spin-instance")
 S3_BASE_URL = f"https://{S3_BUCKET_NAME}.s3.us-east-2.amazonaws.com"
 
+# Agreement task_type -> split whose mappings hold its image and annotation
+TASK_TYPE_TO_SPLIT = {
+    "spin_val_parts": "val",
+    "spin_test_parts": "test",
+    "spin_train_parts": "train",
+    "spin_val_subparts": "val",
+    "spin_test_subparts": "test",
+    "spin_train_subparts": "train",
+    "train": "train",
+    "val": "val",
+    "test": "test"
+}
+
+
+def load_json(filepath):
+    """Load a JSON file (uses orjson when it is installed)."""
+    with open(filepath, 'rb') as f:
+        if orjson is not None:
+            return orjson.loads(f.read())
+        return json.load(f)
+
+
+def save_json(data, filepath):
+    """Write data as 2-space indented JSON (uses orjson when it is installed).
+
+    Integer dict keys are written as strings, as the json module does.
+    """
+    with open(filepath, 'wb') as f:
+        if orjson is not None:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        else:
+            f.write(json.dumps(data, indent=2).encode())
+
+
+def dump_compact(data):
+    """Serialize data as single-line JSON bytes (uses orjson when it is installed)."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data).encode()
+
+
+def save_coco_json(coco_data, filepath):
+    """Write COCO data with one image/annotation record per line.
+
+    Records are serialized one at a time as they are written, so the whole
+    document is never built up as one string alongside the COCO dict.
+    """
+    with open(filepath, 'wb') as f:
+        f.write(b'{')
+        for i, (key, value) in enumerate(coco_data.items()):
+            f.write(b',\n  ' if i else b'\n  ')
+            f.write(dump_compact(key) + b': ')
+            if isinstance(value, list):
+                f.write(b'[')
+                for j, item in enumerate(value):
+                    f.write(b',\n    ' if j else b'\n    ')
+                    f.write(dump_compact(item))
+                f.write(b'\n  ]' if value else b']')
+            else:
+                f.write(dump_compact(value))
+        f.write(b'\n}\n')
 
-def load_image_and_annotation_mappings(data_type='part'):
-    """Load image ID -> filename mappings and annotation data from local JSONs in ./data/"""
-    data_dir = os.path.join(os.path.dirname(__file__), "data")
+
+MAPPINGS_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'partinv')
+# Bump whenever the shape of the cached mappings changes
+MAPPINGS_CACHE_VERSION = 1
+
+
+def mappings_cache_path(data_type, paths):
+    """Cache file for the mappings built from paths, keyed by each file's path, mtime and size."""
+    key = [os.path.basename(__file__), MAPPINGS_CACHE_VERSION, data_type]
+    for path in paths:
+        stat = os.stat(path)
+        key.append((os.path.abspath(path), stat.st_mtime_ns, stat.st_size))
+    return os.path.join(MAPPINGS_CACHE_DIR, blake2b(repr(key).encode(), digest_size=16).hexdigest() + '.pkl')
+
+
+def load_cached_mappings(cache_path):
+    """Return the (image_mappings, annotation_mappings) stored at cache_path, or None if there is no usable entry."""
+    try:
+        with open(cache_path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def save_cached_mappings(cache_path, mappings):
+    """Store mappings at cache_path; a failed write only costs the next run a re-parse."""
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(mappings, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: Could not write mappings cache {cache_path}: {e}")
+
+
+def build_mappings(data_files):
+    """Parse the split JSON files into image and annotation mappings per split."""
     image_mappings = {
         "train": {},
         "val": {},
@@ -24,6 +127,45 @@ def load_image_and_annotation_mappings(data_type='part'):
         "test": {}
     }
 
+    for fp in data_files:
+        data = load_json(fp)
+
+        split = os.path.basename(fp).split("_")[1]  # val, test, train
+
+        # Load image mappings
+        for img in data.get("images", []):
+            image_id = img.get("id")
+            file_name = img.get("file_name")
+            if image_id is not None and file_name:
+                image_mappings[split][image_id] = {
+                    "file_name": file_name,
+                    "height": img.get("height"),
+                    "width": img.get("width")
+                }
+                # print(f"   • Loaded image_id {image_id} -> {file_name} ({img.get('width')}x{img.get('height')}) in {split}")
+
+        # Load annotation mappings
+        for ann in data.get("annotations", []):
+            ann_id = ann.get("id")
+            if ann_id is not None:
+                annotation_mappings[split][ann_id] = (ann.get("bbox", []), ann.get("area", 0),
+                                                      "segmentation" in ann, ann.get("segmentation"))
+
+    return image_mappings, annotation_mappings
+
+
+def load_image_and_annotation_mappings(data_type='part', dump_dir=None):
+    """Load image ID -> filename mappings and annotation data from local JSONs in ./data/
+
+    Annotations are kept as (bbox, area, has_segmentation, segmentation) tuples,
+    the only fields the COCO conversion uses; has_segmentation tells an explicit
+    null segmentation apart from a missing one.
+    The parsed mappings are cached on disk until one of the JSON files changes.
+    If dump_dir is given, the image mappings are also saved there as
+    image_mappings.json for debugging.
+    """
+    data_dir = os.path.join(os.path.dirname(__file__), "data")
+
     # Select data files based on type (part or subpart)
     suffix = "parts" if data_type == "part" else "subparts"
     data_files = [
@@ -31,39 +173,25 @@ def load_image_and_annotation_mappings(data_type='part'):
         f"spin_test_{suffix}.json",
         f"spin_train_{suffix}.json",
     ]
+    existing_files = [os.path.join(data_dir, data_file) for data_file in data_files
+                      if os.path.exists(os.path.join(data_dir, data_file))]
 
-    for data_file in data_files:
-        fp = os.path.join(data_dir, data_file)
-        if os.path.exists(fp):
-            with open(fp, "r") as f:
-                data = json.load(f)
-
-            split = data_file.split("_")[1]  # val, test, train
-
-            # Load image mappings
-            for img in data.get("images", []):
-                image_id = img.get("id")
-                file_name = img.get("file_name")
-                if image_id is not None and file_name:
-                    image_mappings[split][image_id] = {
-                        "file_name": file_name,
-                        "height": img.get("height"),
-                        "width": img.get("width")
-                    }
-                    # print(f"   • Loaded image_id {image_id} -> {file_name} ({img.get('width')}x{img.get('height')}) in {split}")
-
-            # Load annotation mappings
-            for ann in data.get("annotations", []):
-                ann_id = ann.get("id")
-                if ann_id is not None:
-                    annotation_mappings[split][ann_id] = ann
+    # Reuse the mappings parsed by an earlier run unless a split file has changed since
+    cache_path = mappings_cache_path(data_type, existing_files)
+    mappings = load_cached_mappings(cache_path)
+    if mappings is None:
+        mappings = build_mappings(existing_files)
+        save_cached_mappings(cache_path, mappings)
+    image_mappings, annotation_mappings = mappings
 
     # print(f"Loaded {sum(len(split_imgs) for split_imgs in image_mappings.values())} image mappings and {len(annotation_mappings)} annotations")
 
-    # save image mappings to a JSON file
-    with open("image_mappings.json", "w") as f:
-        json.dump(image_mappings, f, indent=2)
-        print("Saved image mappings to image_mappings.json")
+    # Optionally save image mappings to a JSON file for debugging
+    if dump_dir is not None:
+        os.makedirs(dump_dir, exist_ok=True)
+        dump_file = os.path.join(dump_dir, "image_mappings.json")
+        save_json(image_mappings, dump_file)
+        print(f"Saved image mappings to {dump_file}")
 
     return image_mappings, annotation_mappings
 
@@ -71,15 +199,24 @@ def load_image_and_annotation_mappings(data_type='part'):
 def generate_s3_url(file_name, prefix="train"):
     """Generate S3 URL for an image file."""
     fn = file_name.lstrip("/")
-    if "." not in os.path.basename(fn):
+    if "." not in fn.rpartition("/")[2]:
         fn = f"{fn}.JPEG"
     return f"{S3_BASE_URL}/{prefix}/{fn}" if prefix else f"{S3_BASE_URL}/{fn}"
 
-def process_agreement_file_to_coco(agreement_file_path, image_mappings, annotation_mappings):
-    """Convert agreement file to COCO format for CVAT import - images only for manual annotation."""
+def process_agreement_file_to_coco(agreement_file_path, image_mappings, annotation_mappings, created=None,
+                                   verbose=False):
+    """Convert agreement file to COCO format for CVAT import - images only for manual annotation.
+
+    created is the datetime stamped into the COCO info block (default: now); pass the
+    same value for every file of a run so they all carry one creation time.
+    With verbose, every agreement and every skipped one is logged; otherwise skips
+    are only counted and reported in one line at the end.
+    """
     try:
-        with open(agreement_file_path, "r") as f:
-            agreement_data = json.load(f)
+        agreement_data = load_json(agreement_file_path)
+
+        if created is None:
+            created = datetime.now()
 
         category = agreement_data.get("category")
         agreements = agreement_data.get("results", [])
@@ -98,9 +235,9 @@ def process_agreement_file_to_coco(agreement_file_path, image_mappings, annotati
             "info": {
                 "description": f"SPIN Instance Dataset - {category} Multiple Instances (With Original Annotations)",
                 "version": "1.0",
-                "year": datetime.now().year,
+                "year": created.year,
                 "contributor": "SPIN Project",
-                "date_created": datetime.now().isoformat()
+                "date_created": created.isoformat()
             },
             "licenses": [
                 {
@@ -123,43 +260,45 @@ def process_agreement_file_to_coco(agreement_file_path, image_mappings, annotati
         # Track processed images to avoid duplicates
         processed_images = set()
         annotation_id_counter = 0
-        conversion = {
-            "spin_val_parts": "val",
-            "spin_test_parts": "test",
-            "spin_train_parts": "train",
-            "spin_val_subparts": "val",
-            "spin_test_subparts": "test",
-            "spin_train_subparts": "train",
-            "train": "train",
-            "val": "val",
-            "test": "test"
+        unknown_splits = 0
+        missing_images = 0
+        missing_annotations = 0
+
+        # Pair up each split's image and annotation mappings so the loop does one lookup per agreement
+        split_mappings = {
+            split: (image_mappings[split], annotation_mappings[split])
+            for split in image_mappings
         }
 
         for agreement in multiple_agreements:
             image_id = agreement.get("image_id")
             annotation_id = agreement.get("annotation_id")
             task_types = agreement.get("task_type")
-            print(f"   🔍 Processing image_id {image_id}, annotation_id {annotation_id} with task_types {task_types}")
-            if task_types in conversion:
-                splits = conversion.get(task_types)
-            else:
-                splits = agreement.get("split")  # Fallback to 'split' field if available
+            if verbose:
+                print(f"   🔍 Processing image_id {image_id}, annotation_id {annotation_id} with task_types {task_types}")
+            # Fall back to the 'split' field for unknown task types
+            splits = TASK_TYPE_TO_SPLIT.get(task_types) or agreement.get("split")
 
             if image_id is None or annotation_id is None:
                 continue
 
             if splits is None:
-                print(f"   ⚠️  Unknown task_types '{task_types}' for image_id {image_id}")
+                unknown_splits += 1
+                if verbose:
+                    print(f"   ⚠️  Unknown task_types '{task_types}' for image_id {image_id}")
                 continue
 
 
+            split_images, split_annotations = split_mappings[splits]
+
             # Get image info
-            if image_id not in image_mappings[splits]:
-                print(f"   ⚠️  Missing image mapping for image_id {image_id}")
+            image_info = split_images.get(image_id)
+            if image_info is None:
+                missing_images += 1
+                if verbose:
+                    print(f"   ⚠️  Missing image mapping for image_id {image_id}")
                 continue
 
-            image_info = image_mappings[splits][image_id]
-
             # Add image to COCO (only once per image)
             if image_id not in processed_images:
                 coco_image = {
@@ -173,8 +312,9 @@ def process_agreement_file_to_coco(agreement_file_path, image_mappings, annotati
                 processed_images.add(image_id)
 
             # Add annotation from original data
-            if annotation_id in annotation_mappings[splits]:
-                original_annotation = annotation_mappings[splits][annotation_id]
+            original_annotation = split_annotations.get(annotation_id)
+            if original_annotation is not None:
+                bbox, area, has_segmentation, segmentation = original_annotation
 
                 # Convert to COCO annotation format
                 coco_annotation = {
@@ -183,18 +323,24 @@ def process_agreement_file_to_coco(agreement_file_path, image_mappings, annotati
                     "split": splits,
                     "image_id": image_id,
                     "category_id": 1,  # Our single category
-                    "bbox": original_annotation.get("bbox", []),
-                    "area": original_annotation.get("area", 0),
+                    "bbox": bbox,
+                    "area": area,
                     "iscrowd": 0
                 }
 
                 # Add segmentation if available
-                if "segmentation" in original_annotation:
-                    coco_annotation["segmentation"] = original_annotation["segmentation"]
+                if has_segmentation:
+                    coco_annotation["segmentation"] = segmentation
                 coco_data["annotations"].append(coco_annotation)
                 annotation_id_counter += 1
             else:
-                print(f"   ⚠️  Missing annotation mapping for annotation_id {annotation_id}")
+                missing_annotations += 1
+                if verbose:
+                    print(f"   ⚠️  Missing annotation mapping for annotation_id {annotation_id}")
+
+        if unknown_splits or missing_images or missing_annotations:
+            print(f"   ⚠️  Skipped {unknown_splits} unknown task types, {missing_images} missing image mappings, "
+                  f"{missing_annotations} missing annotation mappings")
 
         if not coco_data["images"]:
             print(f"   ❌ No valid images found for {category}")
@@ -226,8 +372,7 @@ def save_coco_file(coco_result, output_dir):
     output_file = os.path.join(output_dir, f"{safe_category}_coco.json")
 
     try:
-        with open(output_file, 'w') as f:
-            json.dump(coco_result["coco_data"], f, indent=2)
+        save_coco_json(coco_result["coco_data"], output_file)
 
         print(f"   💾 Saved COCO file: {output_file}")
         return output_file
@@ -237,6 +382,40 @@ def save_coco_file(coco_result, output_dir):
         return None
 
 
+# Mappings handed to each worker process once by init_worker, so they are not pickled per task
+_worker_mappings = None
+
+
+def init_worker(image_mappings, annotation_mappings):
+    """Process pool initializer: keep the shared mappings for convert_agreement_file."""
+    global _worker_mappings
+    _worker_mappings = (image_mappings, annotation_mappings)
+
+
+def convert_agreement_file(agreement_file, output_dir, created, verbose=False,
+                           image_mappings=None, annotation_mappings=None):
+    """Convert one agreement file to COCO and save it.
+
+    Returns the summary entry for the file (without the COCO data itself) or None.
+    The mappings default to the ones installed by init_worker.
+    """
+    if image_mappings is None:
+        image_mappings, annotation_mappings = _worker_mappings
+
+    coco_result = process_agreement_file_to_coco(agreement_file, image_mappings, annotation_mappings, created,
+                                                 verbose)
+    if not coco_result:
+        return None
+
+    output_file = save_coco_file(coco_result, output_dir)
+    if not output_file:
+        return None
+
+    summary = {key: value for key, value in coco_result.items() if key != "coco_data"}
+    summary["output_file"] = output_file
+    return summary
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Generate COCO format files from agreement data for manual CVAT import",
@@ -281,6 +460,16 @@ Examples:
         action="store_true",
         help="List available categories"
     )
+    parser.add_argument(
+        "--debug-dump-mappings",
+        action="store_true",
+        help="Also save the loaded image mappings to image_mappings.json in the output directory"
+    )
+    parser.add_argument(
+        "--verbose", "-v",
+        action="store_true",
+        help="Log every agreement and every skipped one instead of a per-category summary"
+    )
 
     args = parser.parse_args()
 
@@ -295,7 +484,10 @@ Examples:
         return
 
 
-    agreement_files = glob.glob(os.path.join(agreements_dir, "*_agreements.json"))
+    # One scandir pass; DirEntry.is_file() answers from the cached d_type without a stat per entry
+    with os.scandir(agreements_dir) as entries:
+        agreement_files = [entry.path for entry in entries
+                           if entry.name.endswith("_agreements.json") and entry.is_file()]
     if not agreement_files:
         print(f"❌ No agreement files in {agreements_dir}")
         return
@@ -319,7 +511,8 @@ Examples:
 
     # Load mappings
     print(f"🔄 Loading {args.type} image and annotation mappings...")
-    image_mappings, annotation_mappings = load_image_and_annotation_mappings(args.type)
+    image_mappings, annotation_mappings = load_image_and_annotation_mappings(
+        args.type, dump_dir=args.output_dir if args.debug_dump_mappings else None)
 
     if not image_mappings or not annotation_mappings:
         print("❌ No mappings loaded. Check your data files.")
@@ -330,7 +523,7 @@ Examples:
     if args.category:
         target = os.path.join(agreements_dir, f"{args.category}_agreements.json")
         print(f"🔍 Looking for category file: {target}")
-        if os.path.exists(target):
+        if os.path.isfile(target):
             files_to_process.append(target)
         else:
             print(f"❌ Agreement file not found for category: {args.category}")
@@ -339,19 +532,22 @@ Examples:
     else:
         files_to_process = agreement_files
 
-    # Process files
+    # Process files, stamping every COCO file of this run with the same creation time
     print(f"\n🚀 Processing {len(files_to_process)} agreement file(s)...")
-    results = []
-
-    for agreement_file in files_to_process:
-        coco_result = process_agreement_file_to_coco(agreement_file, image_mappings, annotation_mappings)
-        if coco_result:
-            output_file = save_coco_file(coco_result, args.output_dir)
-            if output_file:
-                results.append({
-                    **coco_result,
-                    "output_file": output_file
-                })
+    created = datetime.now()
+    if len(files_to_process) == 1:
+        summaries = [convert_agreement_file(files_to_process[0], args.output_dir, created, args.verbose,
+                                            image_mappings, annotation_mappings)]
+    else:
+        # Agreement files are independent, so convert them in parallel worker processes
+        max_workers = min(len(files_to_process), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker,
+                                 initargs=(image_mappings, annotation_mappings)) as executor:
+            futures = [executor.submit(convert_agreement_file, agreement_file, args.output_dir, created, args.verbose)
+                       for agreement_file in files_to_process]
+            summaries = [future.result() for future in futures]
+
+    results = [summary for summary in summaries if summary]
 
     # Summary
     print(f"\n🎉 Summary:")
@@ -0,0 +1,39 @@
+"""
+On-disk pickle cache for data derived from input files.
+
+Entries live under ~/.cache/partinv and are keyed by a caller-chosen tag plus
+each input file's path, mtime and size, so editing any input invalidates them.
+"""
+
+import os
+import pickle
+from hashlib import blake2b
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'partinv')
+
+def cache_file(tag, paths):
+    """Cache file for data derived from paths; tag names the producer and the version of its data format."""
+    key = [tag]
+    for path in paths:
+        stat = os.stat(path)
+        key.append((os.path.abspath(path), stat.st_mtime_ns, stat.st_size))
+    return os.path.join(CACHE_DIR, blake2b(repr(key).encode(), digest_size=16).hexdigest() + '.pkl')
+
+def load_cache(cache_path):
+    """Return the data stored at cache_path, or None if there is no usable entry."""
+    try:
+        with open(cache_path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+def save_cache(cache_path, data):
+    """Store data at cache_path; a failed write only costs the next run a rebuild."""
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: Could not write cache {cache_path}: {e}")